@@ -17,7 +17,10 @@
 #
 import os
 import os.path
+import re
 import stat
+from collections import namedtuple
+from functools import lru_cache
 
 import blivet.util
 from blivet.arch import get_arch
@@ -33,9 +36,27 @@ from pyanaconda.modules.payloads.payload.dnf.tree_info import (
     TreeInfoMetadataError,
 )
 
+try:
+    # Mount ISO images in-process when the bindings are available
+    import libmount
+except ImportError:
+    libmount = None
+
 log = get_module_logger(__name__)
 
 ISO_BLOCK_SIZE = 2048
+ISO_MOUNT_PATH = "/mnt/install/cdimage"
+DISCINFO_FILE = ".discinfo"
+DISCINFO_READ_SIZE = 4096
+DISCINFO_ARCH_RE = re.compile(rb"[^\n]*\n[^\n]*\n(?P<arch>[^\n]*)")
+
+ISO_PRIMARY_VOLUME = 1
+ISO_SUPPLEMENTARY_VOLUME = 2
+ISO_TERMINATOR = 255
+ISO_DIRECTORY_MAX_SIZE = 256 * ISO_BLOCK_SIZE
+JOLIET_ESCAPE_SEQUENCES = (b"%/@", b"%/C", b"%/E")
+
+IsoImageInfo = namedtuple("IsoImageInfo", ["arch", "has_repodata", "size_ok"])
 
 
 def is_tar(url):
@@ -76,15 +97,46 @@ def is_valid_install_disk(tree_dir):
     :rtype: bool
     """
     try:
-        with open(join_paths(tree_dir, ".discinfo"), "r") as f:
-            f.readline()  # throw away timestamp
-            f.readline()  # throw away description
-            arch = f.readline().strip()
-            if arch == get_arch():
-                return True
+        data = _read_discinfo(join_paths(tree_dir, DISCINFO_FILE))
     except OSError:
-        pass
-    return False
+        return False
+
+    arch = _get_discinfo_arch(data)
+    return arch is not None and arch == get_arch()
+
+
+def _read_discinfo(discinfo_path):
+    """Read the beginning of the .discinfo file.
+
+    The file is small, so it is read with a single system call.
+
+    :param str discinfo_path: a path to the .discinfo file
+    :return: bytes
+    :raise: OSError if the file can't be read
+    """
+    fd = os.open(discinfo_path, os.O_RDONLY | os.O_CLOEXEC)
+
+    try:
+        return os.read(fd, DISCINFO_READ_SIZE)
+    finally:
+        os.close(fd)
+
+
+def _get_discinfo_arch(data):
+    """Get the architecture from the content of the .discinfo file.
+
+    The first line is a timestamp, the second line is a description
+    and the third line is an architecture.
+
+    :param bytes data: the content of the .discinfo file
+    :return: a string with the architecture or None
+    """
+    match = DISCINFO_ARCH_RE.match(data)
+
+    if not match:
+        return None
+
+    return match.group("arch").decode("utf-8", "replace").strip()
 
 
 def find_and_mount_device(device_spec, mount_point):
@@ -129,12 +181,19 @@ def find_and_mount_iso_image(source_path, mount_path):
         path_to_iso = _create_iso_path(source_path, iso_name)
 
         if mount_iso_image(path_to_iso, mount_path):
+            # The cached results are not needed anymore.
+            invalidate_iso_image_cache()
             return iso_name
 
     return ""
 
 
-def _find_first_iso_image(path, mount_path="/mnt/install/cdimage"):
+def invalidate_iso_image_cache():
+    """Invalidate the cached info about probed ISO images."""
+    _probe_iso_image.cache_clear()
+
+
+def _find_first_iso_image(path, mount_path=ISO_MOUNT_PATH):
     """Find the first iso image in path.
 
     :param str path: path to the directory with iso image(s); this also supports pointing to
@@ -148,85 +207,314 @@ def _find_first_iso_image(path, mount_path="/mnt/install/cdimage"):
     :rtype: str or None
     """
     try:
-        os.stat(path)
+        path_stat = os.stat(path)
     except OSError:
         return None
 
     arch = get_arch()
-    discinfo_path = os.path.join(mount_path, ".discinfo")
 
-    if os.path.isfile(path) and path.endswith(".iso"):
-        files = [os.path.basename(path)]
-        path = os.path.dirname(path)
+    if stat.S_ISREG(path_stat.st_mode) and _has_iso_suffix(path):
+        entries = [_IsoImageFile(path, path_stat)]
+    elif stat.S_ISDIR(path_stat.st_mode):
+        with os.scandir(path) as it:
+            entries = list(it)
     else:
-        files = os.listdir(path)
+        return None
 
-    for fn in files:
-        what = os.path.join(path, fn)
-        log.debug("Checking %s", what)
-        if not _is_iso_image(what):
+    for entry in entries:
+        # Skip entries that obviously can't be ISO images.
+        if not entry.is_file() or not _has_iso_suffix(entry.name):
             continue
 
-        log.debug("Mounting %s on %s", what, mount_path)
-        try:
-            blivet.util.mount(what, mount_path, fstype="iso9660", options="ro")
-        except OSError:
-            continue
+        st = entry.stat()
 
-        if not os.access(discinfo_path, os.R_OK):
-            blivet.util.umount(mount_path)
+        if st.st_size < ISO_BLOCK_SIZE:
             continue
 
-        log.debug("Reading .discinfo")
-        disc_info = DiscInfo()
+        fn = entry.name
+        what = entry.path
+
+        if not _is_iso_image(what):
+            continue
 
-        # TODO replace next 2 blocks with:
-        #   pyanaconda.modules.payloads.source.utils.is_valid_install_disk
         try:
-            disc_info.load(discinfo_path)
-            disc_arch = disc_info.arch
-        except Exception as ex:  # pylint: disable=broad-except
-            log.warning(".discinfo file can't be loaded: %s", ex)
+            image_info = _probe_iso_image(
+                what, st.st_mtime_ns, st.st_size, mount_path, arch
+            )
+        except OSError:
             continue
 
-        log.debug("discArch = %s", disc_arch)
-        if disc_arch != arch:
+        if not image_info.arch:
+            continue
+
+        if image_info.arch != arch:
             log.warning("Architectures mismatch in find_first_iso_image: %s != %s",
-                        disc_arch, arch)
-            blivet.util.umount(mount_path)
+                        image_info.arch, arch)
             continue
 
         # If there's no repodata, there's no point in trying to
         # install from it.
-        if not _check_repodata(mount_path):
+        if not image_info.has_repodata:
             log.warning("%s doesn't have a valid repodata, skipping", what)
-            blivet.util.umount(mount_path)
             continue
 
         # warn user if images appears to be wrong size
-        if os.stat(what)[stat.ST_SIZE] % 2048:
+        if not image_info.size_ok:
             log.warning(
                 "The ISO image %s has a size which is not "
                 "a multiple of 2048 bytes. This may mean it "
                 "was corrupted on transfer to this computer.",
                 what
             )
-            blivet.util.umount(mount_path)
             continue
 
         log.info("Found disc at %s", fn)
-        blivet.util.umount(mount_path)
         return fn
 
     return None
 
 
+def _has_iso_suffix(path):
+    """Does the file name have the .iso suffix?
+
+    :param str path: a path or a name of the file
+    :return: True or False
+    """
+    return path.lower().endswith(".iso")
+
+
+@lru_cache(maxsize=32)
+def _probe_iso_image(path, mtime, size, mount_path, arch):
+    """Mount the ISO image and collect the info about its content.
+
+    The result is cached, so an unchanged image is not mounted and
+    parsed again. The modification time and the size of the image
+    are part of the cache key for this reason.
+
+    The image is not mounted at all if its .discinfo file can be
+    read directly from the image and the architecture doesn't match.
+
+    :param str path: a path to the ISO image
+    :param int mtime: a modification time of the image in nanoseconds
+    :param int size: a size of the image in bytes
+    :param str mount_path: path for mounting the ISO when checking it
+    :param str arch: the expected architecture
+    :return: an instance of IsoImageInfo
+    :raise: OSError if the image can't be mounted or read
+    """
+    size_ok = not size % ISO_BLOCK_SIZE
+
+    data = _peek_iso_discinfo(path)
+    disc_arch = _get_discinfo_arch(data) if data else None
+
+    if disc_arch and disc_arch != arch:
+        log.debug("discArch = %s", disc_arch)
+        return IsoImageInfo(arch=disc_arch, has_repodata=False, size_ok=size_ok)
+
+    log.debug("Mounting %s on %s", path, mount_path)
+    _mount_iso(path, mount_path)
+
+    try:
+        log.debug("Reading .discinfo")
+
+        # Don't cache the result, the error might be temporary.
+        data = _read_discinfo(os.path.join(mount_path, DISCINFO_FILE))
+
+        disc_info = DiscInfo()
+
+        # TODO replace next block with:
+        #   pyanaconda.modules.payloads.source.utils.is_valid_install_disk
+        try:
+            disc_info.loads(data.decode("utf-8"))
+            disc_arch = disc_info.arch
+        except Exception as ex:  # pylint: disable=broad-except
+            log.warning(".discinfo file can't be loaded: %s", ex)
+            return IsoImageInfo(arch=None, has_repodata=False, size_ok=size_ok)
+
+        log.debug("discArch = %s", disc_arch)
+
+        # Don't load the treeinfo metadata of an unusable image.
+        if disc_arch != arch:
+            return IsoImageInfo(arch=disc_arch, has_repodata=False, size_ok=size_ok)
+
+        has_repodata = _check_repodata(mount_path)
+        return IsoImageInfo(arch=disc_arch, has_repodata=has_repodata, size_ok=size_ok)
+    finally:
+        _umount_iso(mount_path)
+
+
+def _peek_iso_discinfo(path):
+    """Read the .discinfo file directly from the ISO image.
+
+    Only the root directory of the image is searched. The file is
+    found by its Joliet or Rock Ridge name.
+
+    :param str path: a path to the ISO image
+    :return: bytes with the beginning of the .discinfo file or None
+    """
+    try:
+        with open(path, "rb") as iso_file:
+            for root_record, joliet in _get_iso_root_records(iso_file):
+                extent = _find_iso_file(iso_file, root_record, joliet, DISCINFO_FILE)
+
+                if not extent:
+                    continue
+
+                location, length = extent
+                iso_file.seek(location * ISO_BLOCK_SIZE)
+                return iso_file.read(min(length, DISCINFO_READ_SIZE))
+
+    except (OSError, ValueError, IndexError) as e:
+        log.debug("Can't read %s from %s: %s", DISCINFO_FILE, path, e)
+
+    return None
+
+
+def _get_iso_root_records(iso_file):
+    """Get root directory records of the ISO image.
+
+    Read the volume descriptors of the image and yield records of root
+    directories of the Joliet volume and the primary volume.
+
+    :param iso_file: a file object of the ISO image
+    :return: a generator of tuples with a record and a Joliet flag
+    """
+    primary_record = None
+
+    for block_num in range(16, 100):
+        iso_file.seek(block_num * ISO_BLOCK_SIZE)
+        descriptor = iso_file.read(ISO_BLOCK_SIZE)
+
+        if len(descriptor) < ISO_BLOCK_SIZE or descriptor[1:6] != b"CD001":
+            break
+
+        descriptor_type = descriptor[0]
+
+        if descriptor_type == ISO_TERMINATOR:
+            break
+
+        if descriptor_type == ISO_PRIMARY_VOLUME:
+            primary_record = descriptor[156:190]
+
+        if descriptor_type == ISO_SUPPLEMENTARY_VOLUME \
+                and descriptor[88:91] in JOLIET_ESCAPE_SEQUENCES:
+            yield descriptor[156:190], True
+
+    if primary_record:
+        yield primary_record, False
+
+
+def _find_iso_file(iso_file, directory_record, joliet, name):
+    """Find a file in a directory of the ISO image.
+
+    :param iso_file: a file object of the ISO image
+    :param bytes directory_record: a record of the directory
+    :param bool joliet: is it a Joliet directory?
+    :param str name: a name of the file
+    :return: a tuple with a location and a length of the file or None
+    """
+    location, length = _get_iso_record_extent(directory_record)
+
+    iso_file.seek(location * ISO_BLOCK_SIZE)
+    data = iso_file.read(min(length, ISO_DIRECTORY_MAX_SIZE))
+    offset = 0
+
+    while offset < len(data):
+        record_length = data[offset]
+
+        # Records don't cross the block boundary.
+        if not record_length:
+            offset = (offset // ISO_BLOCK_SIZE + 1) * ISO_BLOCK_SIZE
+            continue
+
+        record = data[offset:offset + record_length]
+        offset += record_length
+
+        # Skip directories.
+        if record[25] & 0x02:
+            continue
+
+        if _get_iso_record_name(record, joliet) == name:
+            return _get_iso_record_extent(record)
+
+    return None
+
+
+def _get_iso_record_extent(record):
+    """Get the location and the length of the directory record.
+
+    :param bytes record: a directory record
+    :return: a tuple with a location in blocks and a length in bytes
+    """
+    location = int.from_bytes(record[2:6], "little")
+    length = int.from_bytes(record[10:14], "little")
+    return location, length
+
+
+def _get_iso_record_name(record, joliet):
+    """Get the name of the directory record.
+
+    :param bytes record: a directory record
+    :param bool joliet: is it a Joliet record?
+    :return: a Joliet or Rock Ridge name or None
+    """
+    name_length = record[32]
+    name = record[33:33 + name_length]
+
+    if joliet:
+        return name.decode("utf-16-be", "replace").split(";")[0]
+
+    # Find the Rock Ridge name in the system use area.
+    offset = 33 + name_length + (not name_length % 2)
+    rock_ridge_name = b""
+
+    while offset + 4 <= len(record):
+        signature = record[offset:offset + 2]
+        entry_length = record[offset + 2]
+
+        if entry_length < 4:
+            break
+
+        if signature == b"NM":
+            rock_ridge_name += record[offset + 5:offset + entry_length]
+
+        offset += entry_length
+
+    return rock_ridge_name.decode("utf-8", "replace") or None
+
+
+class _IsoImageFile:
+    """A single ISO image file with the interface of os.DirEntry.
+
+    It allows to check a path pointing directly to an ISO image
+    the same way as the entries of a scanned directory.
+    """
+
+    def __init__(self, path, stat_result=None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = stat_result
+
+    def is_file(self):
+        """Is the entry a file?"""
+        return True
+
+    def stat(self):
+        """Return the cached stat result of the entry."""
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+
+        return self._stat
+
+
 def _is_iso_image(path):
     """Determine if a file is an ISO image or not.
 
     :param path: the full path to a file to check
     :return: True if ISO image, False otherwise
     """
+    log.debug("Checking %s", path)
+
     try:
         with open(path, "rb") as iso_file:
             for block_num in range(16, 100):
@@ -259,13 +547,75 @@ def mount_iso_image(image_path, mount_point):
     :rtype: bool
     """
     try:
-        mount(image_path, mount_point, fstype='iso9660', options="ro")
+        _mount_iso(image_path, mount_point)
         return True
     except OSError as e:
         log.error("Mount of ISO file failed: %s", e)
         return False
 
 
+def _mount_iso(image_path, mount_point):
+    """Mount ISO image read-only.
+
+    Mount the image in-process with libmount if it is available,
+    otherwise run the mount tool. A missing mount point is created
+    in both cases.
+
+    :param str image_path: where the image ISO file is
+    :param str mount_point: where to mount the image
+    :raise: OSError if the image can't be mounted
+    """
+    if libmount is None:
+        # The mount tool reports a failure only with the return code.
+        rc = mount(image_path, mount_point, fstype="iso9660", options="ro")
+
+        if rc != 0:
+            raise OSError("Failed to mount {}: mount returned {}".format(image_path, rc))
+
+        return
+
+    # Unlike the mount tool of blivet, libmount doesn't create the mount point.
+    os.makedirs(mount_point, exist_ok=True)
+
+    context = libmount.Context()
+    context.source = image_path
+    context.target = mount_point
+    context.fstype = "iso9660"
+    context.options = "ro"
+
+    try:
+        context.mount()
+    except Exception as e:  # pylint: disable=broad-except
+        raise OSError("Failed to mount {}: {}".format(image_path, e)) from e
+
+
+def _umount_iso(mount_point):
+    """Unmount ISO image.
+
+    Unmount the image in-process with libmount if it is available,
+    otherwise run the umount tool.
+
+    :param str mount_point: where the image is mounted
+    :raise: OSError if the image can't be unmounted
+    """
+    if libmount is None:
+        # The umount tool reports a failure only with the return code.
+        rc = blivet.util.umount(mount_point)
+
+        if rc != 0:
+            raise OSError("Failed to unmount {}: umount returned {}".format(mount_point, rc))
+
+        return
+
+    context = libmount.Context()
+    context.target = mount_point
+
+    try:
+        context.umount()
+    except Exception as e:  # pylint: disable=broad-except
+        raise OSError("Failed to unmount {}: {}".format(mount_point, e)) from e
+
+
 def _create_iso_path(path, iso_name):
     """Get path to the ISO with the iso_name and path to the ISO.
 
@@ -277,9 +627,10 @@ def _create_iso_path(path, iso_name):
     :return: path to the iso image
     :rtype: str
     """
-    # The directory parameter is not pointing directly to ISO
+    # The directory parameter is not pointing directly to ISO,
+    # the iso_name is a file name, so the paths can be just joined
     if not path.endswith(iso_name):
-        return os.path.normpath(join_paths(path, iso_name))
+        return os.path.join(path, iso_name)
 
     # The directory parameter is pointing directly to ISO
     return path
@@ -200,10 +200,14 @@ def find_optical_media(devicetree):
 def find_mountable_partitions(devicetree):
     """Find all mountable partitions.
 
+    The mountability of a format depends only on its type, so it is
+    checked once per a type of the format.
+
     :param devicetree: an instance of a device tree
     :return: a list of devices
     """
     devices = []
+    mountable = {}
 
     for device in devicetree.devices:
         if device.type != "partition":
@@ -212,7 +216,12 @@ def find_mountable_partitions(devicetree):
         if not device.format.exists:
             continue
 
-        if not device.format.mountable:
+        format_class = type(device.format)
+
+        if format_class not in mountable:
+            mountable[format_class] = device.format.mountable
+
+        if not mountable[format_class]:
             continue
 
         devices.append(device)
@@ -42,10 +42,11 @@ def find_optical_install_media():
     """
     device_tree = STORAGE.get_proxy(DEVICE_TREE)
 
-    for dev in device_tree.FindOpticalMedia():
-        mountpoint = tempfile.mkdtemp()
+    # Reuse the same mount point for all devices.
+    mountpoint = tempfile.mkdtemp()
 
-        try:
+    try:
+        for dev in device_tree.FindOpticalMedia():
             try:
                 payload_utils.mount_device(dev, mountpoint)
             except MountFilesystemError:
@@ -54,13 +55,11 @@ def find_optical_install_media():
                 from pyanaconda.modules.payloads.source.utils import (
                     is_valid_install_disk,
                 )
-                if not is_valid_install_disk(mountpoint):
-                    continue
+                if is_valid_install_disk(mountpoint):
+                    return dev
             finally:
                 payload_utils.unmount_device(dev, mountpoint)
-        finally:
-            os.rmdir(mountpoint)
-
-        return dev
+    finally:
+        os.rmdir(mountpoint)
 
     return None
@@ -138,9 +138,10 @@ class SetUpMountTaskTestCase(unittest.TestCase):
 
 class UtilitiesTestCase(unittest.TestCase):
 
+    @patch("pyanaconda.modules.payloads.source.utils.libmount", None)
     @patch("pyanaconda.modules.payloads.source.utils._find_first_iso_image",
            return_value="skynet.iso")
-    @patch("pyanaconda.modules.payloads.source.utils.mount")
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=0)
     def test_find_and_mount_iso_image(self,
                                       mount_mock,
                                       find_first_iso_image_mock,):
@@ -174,10 +175,10 @@ class UtilitiesTestCase(unittest.TestCase):
 
         assert iso_name == ""
 
+    @patch("pyanaconda.modules.payloads.source.utils.libmount", None)
     @patch("pyanaconda.modules.payloads.source.utils._find_first_iso_image",
            return_value="skynet.iso")
-    @patch("pyanaconda.modules.payloads.source.utils.mount",
-           side_effect=OSError)
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=32)
     def test_find_and_mount_iso_image_fail_mount(self,
                                                  mount_mock,
                                                  find_first_iso_image_mock,):
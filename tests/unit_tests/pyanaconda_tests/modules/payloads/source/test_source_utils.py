@@ -15,11 +15,25 @@
 # License and may only be used or replicated with the express permission of
 # Red Hat, Inc.
 #
+import os
+import tempfile
 import unittest
-from io import StringIO
 from unittest.mock import patch
 
-from pyanaconda.modules.payloads.source.utils import is_tar, is_valid_install_disk
+import pytest
+
+from pyanaconda.modules.payloads.source.utils import (
+    ISO_BLOCK_SIZE,
+    IsoImageInfo,
+    _create_iso_path,
+    _find_first_iso_image,
+    _peek_iso_discinfo,
+    _probe_iso_image,
+    invalidate_iso_image_cache,
+    is_tar,
+    is_valid_install_disk,
+    mount_iso_image,
+)
 
 
 class SourceUtilsTestCase(unittest.TestCase):
@@ -50,31 +64,445 @@ class SourceUtilsTestCase(unittest.TestCase):
         assert is_tar("file://my/path.tar.gz")
         assert is_tar("http://my/path.tar.xz")
 
+    def test_create_iso_path(self):
+        """Test the _create_iso_path function."""
+        assert _create_iso_path("/my/path", "image.iso") == "/my/path/image.iso"
+        assert _create_iso_path("/my/path/", "image.iso") == "/my/path/image.iso"
+        assert _create_iso_path("/my/path/image.iso", "image.iso") == "/my/path/image.iso"
+
 
 class IsValidMethodTestCase(unittest.TestCase):
     """Test the is_valid_install_disk function."""
 
+    def _create_discinfo(self, tree_dir, content):
+        with open(os.path.join(tree_dir, ".discinfo"), "w") as f:
+            f.write(content)
+
     @patch("pyanaconda.modules.payloads.source.utils.get_arch",
            return_value="test-arch")
-    @patch("pyanaconda.modules.payloads.source.utils.open",
-           return_value=StringIO("timestamp\ndescription\ntest-arch\n"))
-    def test_success(self, open_mock, get_arch_mock):
+    def test_success(self, get_arch_mock):
         """Test installation disk validation - arch match."""
-        assert is_valid_install_disk("/some/dir")
+        with tempfile.TemporaryDirectory() as tree_dir:
+            self._create_discinfo(tree_dir, "timestamp\ndescription\ntest-arch\n")
+            assert is_valid_install_disk(tree_dir)
 
     @patch("pyanaconda.modules.payloads.source.utils.get_arch",
            return_value="does-not-match")
-    @patch("pyanaconda.modules.payloads.source.utils.open",
-           return_value=StringIO("timestamp\ndescription\ntest-arch\n"))
-    def test_fail_arch(self, open_mock, get_arch_mock):
+    def test_fail_arch(self, get_arch_mock):
         """Test installation disk validation - arch mismatch."""
-        assert not is_valid_install_disk("/some/dir")
+        with tempfile.TemporaryDirectory() as tree_dir:
+            self._create_discinfo(tree_dir, "timestamp\ndescription\ntest-arch\n")
+            assert not is_valid_install_disk(tree_dir)
 
     @patch("pyanaconda.modules.payloads.source.utils.get_arch")
-    @patch("pyanaconda.modules.payloads.source.utils.open",
-           side_effect=OSError("Mockity mock"))
-    def test_fail_no_file(self, open_mock, get_arch_mock):
+    def test_fail_no_file(self, get_arch_mock):
         """Test installation disk validation - no file."""
         # the exception is caught inside - check that get_arch() is not called instead
-        assert not is_valid_install_disk("/some/dir")
+        with tempfile.TemporaryDirectory() as tree_dir:
+            assert not is_valid_install_disk(tree_dir)
+
+        get_arch_mock.assert_not_called()
+
+    @patch("pyanaconda.modules.payloads.source.utils.get_arch")
+    def test_fail_invalid_file(self, get_arch_mock):
+        """Test installation disk validation - invalid file."""
+        with tempfile.TemporaryDirectory() as tree_dir:
+            self._create_discinfo(tree_dir, "timestamp\n")
+            assert not is_valid_install_disk(tree_dir)
+
         get_arch_mock.assert_not_called()
+
+
+class FindFirstIsoImageTestCase(unittest.TestCase):
+    """Test the _find_first_iso_image function."""
+
+    def setUp(self):
+        invalidate_iso_image_cache()
+
+        # Use the blivet utilities to mount ISO images.
+        libmount_patcher = patch("pyanaconda.modules.payloads.source.utils.libmount", None)
+        libmount_patcher.start()
+        self.addCleanup(libmount_patcher.stop)
+
+    def test_missing_path(self):
+        """Test finding an ISO image in a missing path."""
+        assert _find_first_iso_image("/some/missing/path") is None
+
+    def _create_file(self, path, size=ISO_BLOCK_SIZE):
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+
+    @patch("pyanaconda.modules.payloads.source.utils._is_iso_image", return_value=False)
+    def test_single_image(self, is_iso_image_mock):
+        """Test finding an ISO image in a path to the image."""
+        with tempfile.TemporaryDirectory() as path:
+            iso_path = os.path.join(path, "image.iso")
+            self._create_file(iso_path)
+
+            assert _find_first_iso_image(iso_path) is None
+            is_iso_image_mock.assert_called_once_with(iso_path)
+
+            # Files without the .iso suffix are not ISO images.
+            txt_path = os.path.join(path, "image.txt")
+            self._create_file(txt_path)
+
+            assert _find_first_iso_image(txt_path) is None
+            is_iso_image_mock.assert_called_once_with(iso_path)
+
+            # The suffix is not case-sensitive.
+            upper_path = os.path.join(path, "image.ISO")
+            self._create_file(upper_path)
+
+            assert _find_first_iso_image(upper_path) is None
+            is_iso_image_mock.assert_called_with(upper_path)
+
+    @patch("pyanaconda.modules.payloads.source.utils._is_iso_image", return_value=False)
+    def test_skip_entries(self, is_iso_image_mock):
+        """Test finding an ISO image skips invalid entries."""
+        with tempfile.TemporaryDirectory() as path:
+            os.mkdir(os.path.join(path, "directory.iso"))
+            self._create_file(os.path.join(path, "image.txt"))
+            self._create_file(os.path.join(path, "small.iso"), size=ISO_BLOCK_SIZE - 1)
+            self._create_file(os.path.join(path, "image.ISO"))
+
+            assert _find_first_iso_image(path) is None
+
+        is_iso_image_mock.assert_called_once_with(os.path.join(path, "image.ISO"))
+
+    @patch("pyanaconda.modules.payloads.source.utils.get_arch", return_value="x86_64")
+    @patch("pyanaconda.modules.payloads.source.utils._is_iso_image", return_value=True)
+    @patch("pyanaconda.modules.payloads.source.utils._probe_iso_image")
+    def test_find_image(self, probe_mock, is_iso_image_mock, get_arch_mock):
+        """Test finding a valid ISO image."""
+        probe_mock.side_effect = lambda path, *args: IsoImageInfo(
+            arch="x86_64" if path.endswith("b.iso") else "s390x",
+            has_repodata=True,
+            size_ok=True
+        )
+
+        with tempfile.TemporaryDirectory() as path:
+            # The image of a different architecture is skipped.
+            self._create_file(os.path.join(path, "a.iso"))
+            assert _find_first_iso_image(path) is None
+
+            self._create_file(os.path.join(path, "b.iso"))
+            assert _find_first_iso_image(path) == "b.iso"
+
+    @patch("pyanaconda.modules.payloads.source.utils._check_repodata", return_value=True)
+    @patch("pyanaconda.modules.payloads.source.utils.DiscInfo")
+    @patch("pyanaconda.modules.payloads.source.utils.blivet.util")
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=0)
+    def test_probe_image_cache(self, mount_mock, blivet_util_mock, disc_info_mock,
+                               check_repodata_mock):
+        """Test the cache of the probed ISO images."""
+        disc_info_mock.return_value.arch = "x86_64"
+        blivet_util_mock.umount.return_value = 0
+
+        with tempfile.TemporaryDirectory() as mount_path:
+            open(os.path.join(mount_path, ".discinfo"), "w").close()
+
+            info = _probe_iso_image("/images/a.iso", 1, 4096, mount_path, "x86_64")
+            assert info == IsoImageInfo(arch="x86_64", has_repodata=True, size_ok=True)
+
+            # The unchanged image is not mounted again.
+            assert _probe_iso_image("/images/a.iso", 1, 4096, mount_path, "x86_64") == info
+            mount_mock.assert_called_once_with(
+                "/images/a.iso", mount_path, fstype="iso9660", options="ro"
+            )
+            blivet_util_mock.umount.assert_called_once_with(mount_path)
+
+            # The modified image is mounted again.
+            _probe_iso_image("/images/a.iso", 2, 4096, mount_path, "x86_64")
+            assert mount_mock.call_count == 2
+
+            # The invalidated cache is not used.
+            invalidate_iso_image_cache()
+            _probe_iso_image("/images/a.iso", 2, 4096, mount_path, "x86_64")
+            assert mount_mock.call_count == 3
+
+    @patch("pyanaconda.modules.payloads.source.utils._check_repodata")
+    @patch("pyanaconda.modules.payloads.source.utils.DiscInfo")
+    @patch("pyanaconda.modules.payloads.source.utils.blivet.util")
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=0)
+    def test_probe_image_skip_repodata(self, mount_mock, blivet_util_mock, disc_info_mock,
+                                       check_repodata_mock):
+        """Test that the repodata of a mismatched ISO image are not checked."""
+        disc_info_mock.return_value.arch = "s390x"
+        blivet_util_mock.umount.return_value = 0
+
+        with tempfile.TemporaryDirectory() as mount_path:
+            open(os.path.join(mount_path, ".discinfo"), "w").close()
+
+            info = _probe_iso_image("/images/a.iso", 1, 4096, mount_path, "x86_64")
+            assert info == IsoImageInfo(arch="s390x", has_repodata=False, size_ok=True)
+
+        check_repodata_mock.assert_not_called()
+        blivet_util_mock.umount.assert_called_once_with(mount_path)
+
+    @patch("pyanaconda.modules.payloads.source.utils._check_repodata")
+    @patch("pyanaconda.modules.payloads.source.utils.blivet.util")
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=0)
+    def test_probe_image_no_discinfo(self, mount_mock, blivet_util_mock, check_repodata_mock):
+        """Test that ISO images without the .discinfo file are not cached."""
+        blivet_util_mock.umount.return_value = 0
+
+        with tempfile.TemporaryDirectory() as mount_path:
+            for _i in range(2):
+                with pytest.raises(OSError):
+                    _probe_iso_image("/images/a.iso", 1, 4096, mount_path, "x86_64")
+
+        assert mount_mock.call_count == 2
+        check_repodata_mock.assert_not_called()
+        blivet_util_mock.umount.assert_called_with(mount_path)
+
+    @patch("pyanaconda.modules.payloads.source.utils.blivet.util")
+    @patch("pyanaconda.modules.payloads.source.utils.mount", side_effect=OSError)
+    def test_probe_image_mount_failure(self, mount_mock, blivet_util_mock):
+        """Test that failed mounts of ISO images are not cached."""
+        for _i in range(2):
+            with pytest.raises(OSError):
+                _probe_iso_image("/images/a.iso", 1, 4096, "/mnt/iso", "x86_64")
+
+        assert mount_mock.call_count == 2
+        blivet_util_mock.umount.assert_not_called()
+
+    @patch("pyanaconda.modules.payloads.source.utils.blivet.util")
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=32)
+    def test_probe_image_mount_return_code(self, mount_mock, blivet_util_mock):
+        """Test that mounts of ISO images failed with a return code are not cached."""
+        for _i in range(2):
+            with pytest.raises(OSError):
+                _probe_iso_image("/images/a.iso", 1, 4096, "/mnt/iso", "x86_64")
+
+        assert mount_mock.call_count == 2
+        blivet_util_mock.umount.assert_not_called()
+
+    @patch("pyanaconda.modules.payloads.source.utils.get_arch", return_value="x86_64")
+    @patch("pyanaconda.modules.payloads.source.utils._is_iso_image", return_value=True)
+    @patch("pyanaconda.modules.payloads.source.utils._probe_iso_image")
+    def test_skip_secondary_arch_image(self, probe_mock, is_iso_image_mock, get_arch_mock):
+        """Test finding an ISO image skips images of a secondary architecture."""
+        probe_mock.return_value = IsoImageInfo(arch="i686", has_repodata=True, size_ok=True)
+
+        with tempfile.TemporaryDirectory() as path:
+            self._create_file(os.path.join(path, "a.iso"))
+            assert _find_first_iso_image(path) is None
+
+    @patch("pyanaconda.modules.payloads.source.utils._is_iso_image")
+    @patch("pyanaconda.modules.payloads.source.utils._probe_iso_image")
+    def test_skip_invalid_images(self, probe_mock, is_iso_image_mock):
+        """Test finding an ISO image skips files that are not ISO images."""
+        is_iso_image_mock.side_effect = lambda path: path.endswith("b.iso")
+        probe_mock.return_value = IsoImageInfo(arch=None, has_repodata=False, size_ok=True)
+
+        with tempfile.TemporaryDirectory() as path:
+            for name in ("a.iso", "b.iso", "c.iso"):
+                self._create_file(os.path.join(path, name))
+
+            assert _find_first_iso_image(path) is None
+
+        assert is_iso_image_mock.call_count == 3
+        probe_mock.assert_called_once()
+        assert probe_mock.call_args[0][0] == os.path.join(path, "b.iso")
+
+    @patch("pyanaconda.modules.payloads.source.utils.mount")
+    def test_probe_image_arch_mismatch(self, mount_mock):
+        """Test that ISO images with a wrong architecture are not mounted."""
+        with tempfile.TemporaryDirectory() as path:
+            iso_path = os.path.join(path, "image.iso")
+            _create_iso_image(iso_path, DISCINFO_CONTENT)
+
+            info = _probe_iso_image(iso_path, 1, 4096, "/mnt/iso", "s390x")
+            assert info == IsoImageInfo(arch="x86_64", has_repodata=False, size_ok=True)
+
+        mount_mock.assert_not_called()
+
+
+class MountIsoImageTestCase(unittest.TestCase):
+    """Test the mount_iso_image function."""
+
+    @patch("pyanaconda.modules.payloads.source.utils.mount")
+    @patch("pyanaconda.modules.payloads.source.utils.libmount")
+    def test_mount_with_libmount(self, libmount_mock, mount_mock):
+        """Test mounting an ISO image with libmount."""
+        context = libmount_mock.Context.return_value
+
+        with tempfile.TemporaryDirectory() as mount_path:
+            assert mount_iso_image("/images/a.iso", mount_path)
+
+            assert context.source == "/images/a.iso"
+            assert context.target == mount_path
+            assert context.fstype == "iso9660"
+            assert context.options == "ro"
+            context.mount.assert_called_once_with()
+            mount_mock.assert_not_called()
+
+    @patch("pyanaconda.modules.payloads.source.utils.libmount")
+    def test_mount_with_libmount_missing_mount_point(self, libmount_mock):
+        """Test mounting an ISO image with libmount to a missing mount point."""
+        context = libmount_mock.Context.return_value
+        context.mount.side_effect = lambda: assert_mount_point(context.target)
+
+        def assert_mount_point(path):
+            assert os.path.isdir(path)
+
+        with tempfile.TemporaryDirectory() as path:
+            mount_path = os.path.join(path, "mount", "iso")
+            assert mount_iso_image("/images/a.iso", mount_path)
+
+            assert context.target == mount_path
+            context.mount.assert_called_once_with()
+
+    @patch("pyanaconda.modules.payloads.source.utils.DiscInfo")
+    @patch("pyanaconda.modules.payloads.source.utils.libmount")
+    def test_probe_with_libmount(self, libmount_mock, disc_info_mock):
+        """Test probing an ISO image with libmount."""
+        invalidate_iso_image_cache()
+        context = libmount_mock.Context.return_value
+        disc_info_mock.return_value.arch = "s390x"
+
+        with tempfile.TemporaryDirectory() as path:
+            mount_path = os.path.join(path, "iso")
+
+            # The mount point has to exist when the image is mounted.
+            def _mount():
+                open(os.path.join(mount_path, ".discinfo"), "w").close()
+
+            context.mount.side_effect = _mount
+            info = _probe_iso_image("/images/a.iso", 1, 4096, mount_path, "x86_64")
+
+            assert info == IsoImageInfo(arch="s390x", has_repodata=False, size_ok=True)
+
+        context.mount.assert_called_once_with()
+        context.umount.assert_called_once_with()
+
+    @patch("pyanaconda.modules.payloads.source.utils.libmount")
+    def test_mount_with_libmount_failure(self, libmount_mock):
+        """Test failure when mounting an ISO image with libmount."""
+        context = libmount_mock.Context.return_value
+        context.mount.side_effect = Exception("Fake error.")
+
+        with tempfile.TemporaryDirectory() as mount_path:
+            with self.assertLogs("anaconda.modules.payloads.source.utils", level="ERROR"):
+                assert not mount_iso_image("/images/a.iso", mount_path)
+
+    @patch("pyanaconda.modules.payloads.source.utils.libmount", None)
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=0)
+    def test_mount_without_libmount(self, mount_mock):
+        """Test mounting an ISO image without libmount."""
+        assert mount_iso_image("/images/a.iso", "/mnt/iso")
+
+        mount_mock.assert_called_once_with(
+            "/images/a.iso",
+            "/mnt/iso",
+            fstype="iso9660",
+            options="ro"
+        )
+
+    @patch("pyanaconda.modules.payloads.source.utils.libmount", None)
+    @patch("pyanaconda.modules.payloads.source.utils.mount", return_value=32)
+    def test_mount_without_libmount_failure(self, mount_mock):
+        """Test failure when mounting an ISO image without libmount."""
+        with self.assertLogs("anaconda.modules.payloads.source.utils", level="ERROR"):
+            assert not mount_iso_image("/images/a.iso", "/mnt/iso")
+
+        mount_mock.assert_called_once_with(
+            "/images/a.iso",
+            "/mnt/iso",
+            fstype="iso9660",
+            options="ro"
+        )
+
+
+DISCINFO_CONTENT = b"1700000000.000000\nFedora 40\nx86_64\nALL\n"
+
+
+def _create_directory_record(location, length, name, flags=0, system_use=b""):
+    """Create a directory record of an ISO image."""
+    record = bytearray(33)
+    record[2:6] = location.to_bytes(4, "little")
+    record[6:10] = location.to_bytes(4, "big")
+    record[10:14] = length.to_bytes(4, "little")
+    record[14:18] = length.to_bytes(4, "big")
+    record[25] = flags
+    record[32] = len(name)
+    record += name
+
+    if not len(name) % 2:
+        record += b"\0"
+
+    record += system_use
+    record[0] = len(record)
+    return bytes(record)
+
+
+def _create_volume_descriptor(descriptor_type, root_record, escape_sequence=b""):
+    """Create a volume descriptor of an ISO image."""
+    descriptor = bytearray(ISO_BLOCK_SIZE)
+    descriptor[0] = descriptor_type
+    descriptor[1:6] = b"CD001"
+    descriptor[6] = 1
+    descriptor[88:88 + len(escape_sequence)] = escape_sequence
+    descriptor[156:156 + len(root_record)] = root_record
+    return bytes(descriptor)
+
+
+def _create_iso_image(path, discinfo, joliet=False):
+    """Create a minimal ISO image with the .discinfo file.
+
+    The file is stored in the root directory with the given content
+    and with a Rock Ridge or Joliet name.
+    """
+    if joliet:
+        name = ".discinfo;1".encode("utf-16-be")
+        file_record = _create_directory_record(19, len(discinfo), name)
+    else:
+        name_entry = b"NM" + bytes([5 + len(".discinfo"), 1, 0]) + b".discinfo"
+        file_record = _create_directory_record(19, len(discinfo), b"DISCINFO.;1",
+                                               system_use=name_entry)
+
+    root_directory = \
+        _create_directory_record(18, ISO_BLOCK_SIZE, b"\0", flags=2) + \
+        _create_directory_record(18, ISO_BLOCK_SIZE, b"\1", flags=2) + \
+        file_record
+
+    root_record = _create_directory_record(18, ISO_BLOCK_SIZE, b"\0", flags=2)
+
+    if joliet:
+        volume = _create_volume_descriptor(2, root_record, b"%/E")
+    else:
+        volume = _create_volume_descriptor(1, root_record)
+
+    with open(path, "wb") as f:
+        f.write(bytes(16 * ISO_BLOCK_SIZE))
+        f.write(volume)
+        f.write(_create_volume_descriptor(255, b""))
+        f.write(root_directory.ljust(ISO_BLOCK_SIZE, b"\0"))
+        f.write(discinfo.ljust(ISO_BLOCK_SIZE, b"\0"))
+
+
+class PeekIsoDiscinfoTestCase(unittest.TestCase):
+    """Test the _peek_iso_discinfo function."""
+
+    def _check_iso_image(self, joliet):
+        with tempfile.TemporaryDirectory() as path:
+            iso_path = os.path.join(path, "image.iso")
+            _create_iso_image(iso_path, DISCINFO_CONTENT, joliet=joliet)
+            assert _peek_iso_discinfo(iso_path) == DISCINFO_CONTENT
+
+    def test_rock_ridge(self):
+        """Test reading the .discinfo file with a Rock Ridge name."""
+        self._check_iso_image(joliet=False)
+
+    def test_joliet(self):
+        """Test reading the .discinfo file with a Joliet name."""
+        self._check_iso_image(joliet=True)
+
+    def test_missing_file(self):
+        """Test reading the .discinfo file from an invalid image."""
+        assert _peek_iso_discinfo("/some/missing/image.iso") is None
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(bytes(20 * ISO_BLOCK_SIZE))
+            f.flush()
+            assert _peek_iso_discinfo(f.name) is None
@@ -850,6 +850,19 @@ class DeviceTreeInterfaceTestCase(unittest.TestCase):
 
         assert self.interface.FindMountablePartitions() == [dev2.device_id]
 
+    @patch.object(FS, "update_size_info")
+    def test_find_mountable_partitions_cached(self, update_size_info):
+        """Test FindMountablePartitions checks each format type once."""
+        dev1 = PartitionDevice("dev1", fmt=get_format("ext4", exists=True))
+        self._add_device(dev1)
+        dev2 = PartitionDevice("dev2", fmt=get_format("ext4", exists=True))
+        self._add_device(dev2)
+
+        with patch.object(type(dev1.format), "mountable", new_callable=PropertyMock) as mountable:
+            mountable.return_value = True
+            assert self.interface.FindMountablePartitions() == [dev1.device_id, dev2.device_id]
+            mountable.assert_called_once_with()
+
     @patch.object(LUKS, "setup")
     @patch.object(StorageDevice, "teardown")
     @patch.object(StorageDevice, "setup")
@@ -59,6 +59,22 @@ from tests.unit_tests.pyanaconda_tests import (
 class TimezoneInterfaceTestCase(unittest.TestCase):
     """Test DBus interface for the timezone module."""
 
+    @classmethod
+    def setUpClass(cls):
+        """Set up the time sources."""
+        # Create the time sources only once, they are never modified.
+        server = TimeSourceData()
+        server.type = TIME_SOURCE_SERVER
+        server.hostname = "clock1.example.com"
+        server.options = ["iburst"]
+
+        pool = TimeSourceData()
+        pool.type = TIME_SOURCE_POOL
+        pool.hostname = "clock2.example.com"
+
+        cls.time_sources = [server, pool]
+        cls.time_sources_structure = TimeSourceData.to_structure_list(cls.time_sources)
+
     def setUp(self):
         """Set up the timezone module."""
         # Set up the timezone module.
@@ -317,50 +333,42 @@ class TimezoneInterfaceTestCase(unittest.TestCase):
         assert obj.implementation._ntp_enabled is True
         assert obj.implementation._ntp_servers == []
 
-    @patch_dbus_publish_object
-    def test_install_with_tasks_configured(self, publisher):
+    def _collect_install_tasks(self):
+        """Collect the installation tasks without publishing them."""
+        tasks = self.timezone_module.install_with_tasks()
+        assert [type(task) for task in tasks] == [
+            ConfigureHardwareClockTask,
+            ConfigureTimezoneTask,
+            ConfigureNTPTask,
+        ]
+        return tasks
+
+    def test_install_with_tasks_configured(self):
         """Test install tasks - module in configured state."""
         self.timezone_interface.IsUTC = True
         self.timezone_interface.Timezone = "Asia/Tokyo"
         self.timezone_interface.NTPEnabled = False
         # --nontp and --ntpservers are mutually exclusive in kicstart but
         # there is no such enforcement in the module so for testing this is ok
+        self.timezone_interface.TimeSources = self.time_sources_structure
 
-        server = TimeSourceData()
-        server.type = TIME_SOURCE_SERVER
-        server.hostname = "clock1.example.com"
-        server.options = ["iburst"]
-
-        pool = TimeSourceData()
-        pool.type = TIME_SOURCE_POOL
-        pool.hostname = "clock2.example.com"
-
-        self.timezone_interface.TimeSources = \
-            TimeSourceData.to_structure_list([server, pool])
-
-        task_classes = [
-            ConfigureHardwareClockTask,
-            ConfigureTimezoneTask,
-            ConfigureNTPTask,
-        ]
-        task_paths = self.timezone_interface.InstallWithTasks()
-        task_objs = check_task_creation_list(task_paths, publisher, task_classes)
+        tasks = self._collect_install_tasks()
 
         # ConfigureHardwareClockTask
-        obj = task_objs[0]
-        assert obj.implementation._is_utc is True
+        task = tasks[0]
+        assert task._is_utc is True
 
         # ConfigureTimezoneTask
-        obj = task_objs[1]
-        assert obj.implementation._timezone == "Asia/Tokyo"
-        assert obj.implementation._is_utc is True
+        task = tasks[1]
+        assert task._timezone == "Asia/Tokyo"
+        assert task._is_utc is True
 
         # ConfigureNTPTask
-        obj = task_objs[2]
-        assert obj.implementation._ntp_enabled is False
-        assert len(obj.implementation._ntp_servers) == 2
-        assert compare_data(obj.implementation._ntp_servers[0], server)
-        assert compare_data(obj.implementation._ntp_servers[1], pool)
+        task = tasks[2]
+        assert task._ntp_enabled is False
+        assert len(task._ntp_servers) == 2
+        assert compare_data(task._ntp_servers[0], self.time_sources[0])
+        assert compare_data(task._ntp_servers[1], self.time_sources[1])
 
     @patch_dbus_publish_object
     def test_geoloc_interface(self, publisher):
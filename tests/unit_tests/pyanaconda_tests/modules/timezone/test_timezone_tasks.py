@@ -17,10 +17,12 @@
 #
 # Red Hat Author(s): Vendula Poncova <vponcova@redhat.com>
 #
+import logging
 import os
+import subprocess
 import tempfile
 import unittest
-from shutil import copyfile, copytree
+from shutil import copyfile, copytree, rmtree
 from unittest.mock import patch
 
 import pytest
@@ -35,127 +37,145 @@ from pyanaconda.modules.timezone.installation import (
 )
 from pyanaconda.ntp import NTP_CONFIG_FILE, NTPconfigError
 
+# Create the time sources only once, the tasks never modify them.
+TEST_SERVER = TimeSourceData()
+TEST_SERVER.type = TIME_SOURCE_SERVER
+TEST_SERVER.hostname = "unique.ntp.server"
+TEST_SERVER.options = ["iburst"]
 
-class TimezoneTasksTestCase(unittest.TestCase):
-    """Test the D-Bus Timezone (Timezone only) tasks."""
+TEST_POOL = TimeSourceData()
+TEST_POOL.type = TIME_SOURCE_POOL
+TEST_POOL.hostname = "another.unique.server"
 
-    def test_timezone_task_success(self):
-        """Test the "full success" code paths in timezone D-Bus task."""
-        self._test_timezone_inputs(
-            input_zone="Europe/Prague",
-            input_isutc=False,
-            make_adjtime=True,
-            make_zoneinfo=True,
-            expected_symlink="../usr/share/zoneinfo/Europe/Prague",
-            expected_adjtime_last_line="LOCAL"
-        )
-        self._test_timezone_inputs(
-            input_zone="Africa/Bissau",
-            input_isutc=True,
-            make_adjtime=True,
-            make_zoneinfo=True,
-            expected_symlink="../usr/share/zoneinfo/Africa/Bissau",
-            expected_adjtime_last_line="UTC"
-        )
-        self._test_timezone_inputs(
-            input_zone="Etc/GMT-12",
-            input_isutc=True,
-            make_adjtime=True,
-            make_zoneinfo=True,
-            expected_symlink="../usr/share/zoneinfo/Etc/GMT-12",
-            expected_adjtime_last_line="UTC"
-        )
-        self._test_timezone_inputs(
-            input_zone="Etc/GMT+3",
-            input_isutc=True,
-            make_adjtime=False,
-            make_zoneinfo=True,
-            expected_symlink="../usr/share/zoneinfo/Etc/GMT+3",
-            expected_adjtime_last_line="UTC"
-        )
 
-    def test_timezone_task_correction(self):
-        """Test nonsensical time zone correction in timezone D-Bus task."""
-        self._test_timezone_inputs(
-            input_zone="",
-            input_isutc=True,
-            make_adjtime=True,
-            make_zoneinfo=True,
-            expected_symlink="../usr/share/zoneinfo/America/New_York",
-            expected_adjtime_last_line="UTC"
-        )
-        self._test_timezone_inputs(
-            input_zone="BahBlah",
-            input_isutc=True,
-            make_adjtime=True,
-            make_zoneinfo=True,
-            expected_symlink="../usr/share/zoneinfo/America/New_York",
-            expected_adjtime_last_line="UTC"
-        )
-        self._test_timezone_inputs(
-            input_zone=None,
-            input_isutc=True,
-            make_adjtime=True,
-            make_zoneinfo=True,
-            expected_symlink="../usr/share/zoneinfo/America/New_York",
-            expected_adjtime_last_line="UTC"
+def _get_tmp_dir():
+    """Return a directory for temporary files of the tests.
+
+    Use $ANACONDA_TEST_TMP if it is set, otherwise use tmpfs if
+    it is available. Return None to use the default directory.
+    """
+    tmp_dir = os.environ.get("ANACONDA_TEST_TMP")
+
+    if tmp_dir:
+        return tmp_dir
+
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+
+    return None
+
+
+def _make_sysroot(tmp_dir=None):
+    """Create a temporary sysroot in the given or default directory."""
+    return tempfile.TemporaryDirectory(prefix="sysroot.", dir=tmp_dir or _get_tmp_dir())
+
+
+@pytest.fixture(name="zoneinfo_dir", scope="module")
+def fixture_zoneinfo_dir():
+    """Copy the time zone database only once and link it to sysroots."""
+    # Keep everything in one directory, so the links can be created.
+    tmpdir = tempfile.mkdtemp(prefix="zoneinfo_tests.", dir=_get_tmp_dir())
+    zoneinfo_dir = os.path.join(tmpdir, "zoneinfo")
+    copytree("/usr/share/zoneinfo", zoneinfo_dir)
+    yield zoneinfo_dir
+    rmtree(tmpdir)
+
+
+class TimezoneTasksTestCase:
+    """Test the D-Bus Timezone (Timezone only) tasks."""
+
+    @pytest.fixture
+    def sysroot(self, zoneinfo_dir):
+        """Create a sysroot next to the copy of the time zone database."""
+        with _make_sysroot(os.path.dirname(zoneinfo_dir)) as sysroot:
+            yield sysroot
+
+    @pytest.fixture
+    def zoneinfo_sysroot(self, sysroot, zoneinfo_dir):
+        """Create a sysroot with links to the time zone database."""
+        # Link the files of the time zone database in one native call.
+        os.makedirs(sysroot + "/usr/share")
+        subprocess.run(
+            ["cp", "-al", zoneinfo_dir, sysroot + "/usr/share/zoneinfo"],
+            check=True
         )
+        return sysroot
+
+    @pytest.mark.parametrize(
+        "input_zone,input_isutc,make_adjtime,expected_symlink",
+        [
+            # Test the "full success" code paths.
+            ("Europe/Prague", False, True, "../usr/share/zoneinfo/Europe/Prague"),
+            ("Africa/Bissau", True, True, "../usr/share/zoneinfo/Africa/Bissau"),
+            ("Etc/GMT-12", True, True, "../usr/share/zoneinfo/Etc/GMT-12"),
+            ("Etc/GMT+3", True, False, "../usr/share/zoneinfo/Etc/GMT+3"),
+            # Test nonsensical time zone correction.
+            ("", True, True, "../usr/share/zoneinfo/America/New_York"),
+            ("BahBlah", True, True, "../usr/share/zoneinfo/America/New_York"),
+            (None, True, True, "../usr/share/zoneinfo/America/New_York"),
+        ]
+    )
+    def test_timezone_task_inputs(self, zoneinfo_sysroot, input_zone, input_isutc,
+                                  make_adjtime, expected_symlink):
+        """Test the timezone D-Bus task with different inputs."""
+        sysroot = zoneinfo_sysroot
+        self._setup_environment(sysroot, make_adjtime)
+        self._execute_task(sysroot, input_zone, input_isutc)
+        self._check_timezone_symlink(sysroot, expected_symlink)
+        self._check_utc_lastline(sysroot, "UTC" if input_isutc else "LOCAL")
 
     @patch('pyanaconda.modules.timezone.installation.arch.is_s390', return_value=True)
-    def test_timezone_task_s390(self, mock_is_s390):
+    def test_timezone_task_s390(self, mock_is_s390, zoneinfo_sysroot):
         """Test skipping writing /etc/adjtime on s390"""
-        with tempfile.TemporaryDirectory() as sysroot:
-            self._setup_environment(sysroot, False, True)
-            self._execute_task(sysroot, "Africa/Bissau", False)
-            self._check_timezone_symlink(sysroot, "../usr/share/zoneinfo/Africa/Bissau")
-            assert not os.path.exists(sysroot + "/etc/adjtime")
+        sysroot = zoneinfo_sysroot
+        self._setup_environment(sysroot, False)
+        self._execute_task(sysroot, "Africa/Bissau", False)
+        self._check_timezone_symlink(sysroot, "../usr/share/zoneinfo/Africa/Bissau")
+        assert not os.path.exists(sysroot + "/etc/adjtime")
         mock_is_s390.assert_called_once()
         # expected state: calling it only once in the check for architecture
 
-    def test_timezone_task_timezone_missing(self):
+    def test_timezone_task_timezone_missing(self, sysroot, caplog):
         """Test failure when setting a valid but missing timezone."""
-        with tempfile.TemporaryDirectory() as sysroot:
-            self._setup_environment(sysroot, False, True)
-            os.remove(sysroot + "/usr/share/zoneinfo/Asia/Ulaanbaatar")
-            with self.assertLogs("anaconda.modules.timezone.installation", level="ERROR"):
-                self._execute_task(sysroot, "Asia/Ulaanbaatar", False)
-            assert not os.path.exists(sysroot + "/etc/localtime")
+        self._setup_environment(sysroot, False, "Asia/Ulaanbaatar")
+        os.remove(sysroot + "/usr/share/zoneinfo/Asia/Ulaanbaatar")
+        with caplog.at_level(logging.ERROR, logger="anaconda.modules.timezone.installation"):
+            self._execute_task(sysroot, "Asia/Ulaanbaatar", False)
+        assert "doesn't exist" in caplog.text
+        assert not os.path.exists(sysroot + "/etc/localtime")
 
     @patch("pyanaconda.modules.timezone.installation.os.symlink", side_effect=OSError)
-    def test_timezone_task_symlink_failure(self, mock_os_symlink):
+    def test_timezone_task_symlink_failure(self, mock_os_symlink, sysroot, caplog):
         """Test failure when symlinking the time zone."""
-        with tempfile.TemporaryDirectory() as sysroot:
-            self._setup_environment(sysroot, False, True)
-            with self.assertLogs("anaconda.modules.timezone.installation", level="ERROR"):
-                self._execute_task(sysroot, "Asia/Ulaanbaatar", False)
-            assert not os.path.exists(sysroot + "/etc/localtime")
+        # The time zone file has to exist, but its content is never read.
+        self._setup_environment(sysroot, False, "Asia/Ulaanbaatar")
+        with caplog.at_level(logging.ERROR, logger="anaconda.modules.timezone.installation"):
+            self._execute_task(sysroot, "Asia/Ulaanbaatar", False)
+        assert "Error when symlinking timezone" in caplog.text
+        assert not os.path.exists(sysroot + "/etc/localtime")
 
     @patch('pyanaconda.modules.timezone.installation.open', side_effect=OSError)
-    def test_timezone_task_write_adjtime_failure(self, mock_open):
+    def test_timezone_task_write_adjtime_failure(self, mock_open, sysroot):
         """Test failure when writing the /etc/adjtime file."""
         # Note the first open() in the target code should not fail due to mocking, but it would
         # anyway due to /etc/adjtime missing from env. setup, so it's ok if it does.
-        with tempfile.TemporaryDirectory() as sysroot:
-            with pytest.raises(TimezoneConfigurationError):
-                self._setup_environment(sysroot, False, True)
-                self._execute_task(sysroot, "Atlantic/Faroe", False)
-            assert not os.path.exists(sysroot + "/etc/adjtime")
-            assert os.path.exists(sysroot + "/etc/localtime")
-
-    def _test_timezone_inputs(self, input_zone, input_isutc, make_adjtime, make_zoneinfo,
-                              expected_symlink, expected_adjtime_last_line):
-        with tempfile.TemporaryDirectory() as sysroot:
-            self._setup_environment(sysroot, make_adjtime, make_zoneinfo)
-            self._execute_task(sysroot, input_zone, input_isutc)
-            self._check_timezone_symlink(sysroot, expected_symlink)
-            self._check_utc_lastline(sysroot, expected_adjtime_last_line)
-
-    def _setup_environment(self, sysroot, make_adjtime, make_zoneinfo):
+        # The symlink is created, but the time zone file is never read.
+        self._setup_environment(sysroot, False, "Atlantic/Faroe")
+        with pytest.raises(TimezoneConfigurationError):
+            self._execute_task(sysroot, "Atlantic/Faroe", False)
+        assert not os.path.exists(sysroot + "/etc/adjtime")
+        assert os.path.exists(sysroot + "/etc/localtime")
+
+    def _setup_environment(self, sysroot, make_adjtime, make_zoneinfo_file=None):
         os.mkdir(sysroot + "/etc")
         if make_adjtime:
-            copyfile("/etc/adjtime", sysroot + "/etc/adjtime")
-        if make_zoneinfo:
-            copytree("/usr/share/zoneinfo", sysroot + "/usr/share/zoneinfo")
+            with open(sysroot + "/etc/adjtime", "w") as f:
+                f.write("0.0 0 0.0\n0\nUTC\n")
+        if make_zoneinfo_file:
+            # Create only an empty placeholder of the time zone file.
+            tz_file = sysroot + "/usr/share/zoneinfo/" + make_zoneinfo_file
+            os.makedirs(os.path.dirname(tz_file))
+            open(tz_file, "wb").close()
 
     def _execute_task(self, sysroot, timezone, is_utc):
         task = ConfigureTimezoneTask(
@@ -181,75 +201,54 @@ class TimezoneTasksTestCase(unittest.TestCase):
             assert expected_adjtime_last_line == last_line
 
 
-class NTPTasksTestCase(unittest.TestCase):
+class NTPTasksTestCase:
     """Test the D-Bus NTP tasks from the Timezone module."""
 
-    def test_ntp_task_success(self):
-        """Test the success cases for NTP setup D-Bus task."""
-        self._test_ntp_inputs(
-            make_chronyd=False,
-            ntp_enabled=False
-        )
-        self._test_ntp_inputs(
-            make_chronyd=False,
-            ntp_enabled=True
-        )
-
-    def test_ntp_overwrite(self):
-        """Test overwriting existing config for NTP setup D-Bus task."""
-        self._test_ntp_inputs(
-            make_chronyd=True,
-            ntp_enabled=True
-        )
-        self._test_ntp_inputs(
-            make_chronyd=True,
-            ntp_enabled=False
-        )
-
-    def test_ntp_service(self):
-        """Test enabling of the NTP service in a D-Bus task."""
-        self._test_ntp_inputs(
-            ntp_enabled=False,
-            ntp_installed=True
-        )
+    @pytest.mark.parametrize(
+        "make_chronyd,ntp_enabled,ntp_installed",
+        [
+            # Test the success cases.
+            (False, False, False),
+            (False, True, False),
+            # Test overwriting of an existing config.
+            (True, True, False),
+            (True, False, False),
+            # Test enabling of the NTP service.
+            (False, False, True),
+            (False, True, True),
+        ]
+    )
+    @patch("pyanaconda.modules.timezone.installation.service")
+    def test_ntp_task_inputs(self, service_mock, make_chronyd, ntp_enabled, ntp_installed):
+        """Test the NTP setup D-Bus task with different inputs."""
         self._test_ntp_inputs(
-            ntp_enabled=True,
-            ntp_installed=True
+            service_mock,
+            make_chronyd=make_chronyd,
+            ntp_enabled=ntp_enabled,
+            ntp_installed=ntp_installed
         )
 
+    @pytest.mark.parametrize("make_chronyd", [True, False])
     @patch("pyanaconda.modules.timezone.installation.ntp.save_servers_to_config")
-    def test_ntp_save_failure(self, save_servers):
+    @patch("pyanaconda.modules.timezone.installation.service")
+    def test_ntp_save_failure(self, service_mock, save_servers, make_chronyd, caplog):
         """Test failure when saving NTP config in D-Bus task."""
         save_servers.side_effect = NTPconfigError
 
-        with self.assertLogs("anaconda.modules.timezone.installation", level="WARNING"):
-            self._test_ntp_inputs(
-                make_chronyd=True,
-                ntp_enabled=True,
-                ntp_config_error=True
-            )
-
-        with self.assertLogs("anaconda.modules.timezone.installation", level="WARNING"):
+        with caplog.at_level(logging.WARNING, logger="anaconda.modules.timezone.installation"):
             self._test_ntp_inputs(
-                make_chronyd=False,
+                service_mock,
+                make_chronyd=make_chronyd,
                 ntp_enabled=True,
                 ntp_config_error=True
             )
 
+        assert "Failed to save NTP configuration" in caplog.text
         save_servers.assert_called()
 
     def _get_test_sources(self):
         """Get a list of sources"""
-        server = TimeSourceData()
-        server.type = TIME_SOURCE_SERVER
-        server.hostname = "unique.ntp.server"
-        server.options = ["iburst"]
-
-        pool = TimeSourceData()
-        pool.type = TIME_SOURCE_POOL
-        pool.hostname = "another.unique.server"
-
-        return [server, pool]
+        return [TEST_SERVER, TEST_POOL]
 
     def _get_expected_lines(self):
         return [
@@ -257,18 +256,17 @@ class NTPTasksTestCase(unittest.TestCase):
             "pool another.unique.server\n"
         ]
 
-    def _test_ntp_inputs(self, make_chronyd=False, ntp_enabled=True, ntp_installed=False,
-                         ntp_config_error=False):
+    def _test_ntp_inputs(self, service_util, make_chronyd=False, ntp_enabled=True,
+                         ntp_installed=False, ntp_config_error=False):
         ntp_servers = self._get_test_sources()
         expected_lines = self._get_expected_lines()
 
-        with tempfile.TemporaryDirectory() as sysroot:
+        with _make_sysroot() as sysroot:
             self._setup_environment(sysroot, make_chronyd)
 
-            with patch("pyanaconda.modules.timezone.installation.service") as service_util:
-                service_util.is_service_installed.return_value = ntp_installed
-                self._execute_task(sysroot, ntp_enabled, ntp_servers)
-                self._validate_ntp_service(sysroot, service_util, ntp_installed, ntp_enabled)
+            service_util.is_service_installed.return_value = ntp_installed
+            self._execute_task(sysroot, ntp_enabled, ntp_servers)
+            self._validate_ntp_service(sysroot, service_util, ntp_installed, ntp_enabled)
 
             if ntp_config_error:
                 return
@@ -17,8 +17,10 @@
 #
 # Authors: Jiri Konecny <jkonecny@redhat.com>
 #
+import os
 import unittest
 from functools import partial
+from unittest.mock import call, patch
 
 import pytest
 
@@ -32,8 +34,10 @@ from pyanaconda.core.constants import (
 )
 from pyanaconda.core.payload import create_hdd_url, parse_hdd_url
 from pyanaconda.modules.common.constants.services import PAYLOADS
+from pyanaconda.modules.common.errors.storage import MountFilesystemError
 from pyanaconda.modules.common.structures.payload import RepoConfigurationData
 from pyanaconda.payload.dnf import DNFPayload
+from pyanaconda.payload.image import find_optical_install_media
 from tests.unit_tests.pyanaconda_tests import patch_dbus_get_proxy_with_cache
 
 
@@ -216,3 +220,50 @@ class DNFPayloadOptionsTests(unittest.TestCase):
         proxy = create_source("hd:/dev/sda2:/path/to/iso.iso")
         configuration = RepoConfigurationData.from_structure(proxy.Configuration)
         assert configuration.url == "hd:/dev/sda2:/path/to/iso.iso"
+
+
+class FindOpticalInstallMediaTestCase(unittest.TestCase):
+    """Test the find_optical_install_media function."""
+
+    @patch("pyanaconda.modules.payloads.source.utils.is_valid_install_disk")
+    @patch("pyanaconda.payload.image.payload_utils")
+    @patch("pyanaconda.payload.image.STORAGE")
+    def test_find_optical_install_media(self, storage, payload_utils, is_valid):
+        """Test find_optical_install_media."""
+        device_tree = storage.get_proxy.return_value
+        device_tree.FindOpticalMedia.return_value = ["dev1", "dev2", "dev3"]
+        payload_utils.mount_device.side_effect = \
+            lambda device_id, mountpoint: self._mount_device(device_id)
+        is_valid.side_effect = [False, True]
+
+        assert find_optical_install_media() == "dev3"
+
+        # The devices are probed one by one with the same mount point.
+        mountpoint = payload_utils.mount_device.call_args[0][1]
+        assert payload_utils.mount_device.call_args_list == [
+            call("dev1", mountpoint),
+            call("dev2", mountpoint),
+            call("dev3", mountpoint),
+        ]
+
+        # The device that failed to mount is not unmounted.
+        assert payload_utils.unmount_device.call_args_list == [
+            call("dev1", mountpoint),
+            call("dev3", mountpoint),
+        ]
+
+        assert not os.path.exists(mountpoint)
+
+    @patch("pyanaconda.payload.image.payload_utils")
+    @patch("pyanaconda.payload.image.STORAGE")
+    def test_find_no_optical_install_media(self, storage, payload_utils):
+        """Test find_optical_install_media without devices."""
+        device_tree = storage.get_proxy.return_value
+        device_tree.FindOpticalMedia.return_value = []
+
+        assert find_optical_install_media() is None
+        payload_utils.mount_device.assert_not_called()
+
+    def _mount_device(self, device_id):
+        if device_id == "dev2":
+            raise MountFilesystemError("Fake error.")
@@ -11,4 +11,6 @@ if [ $# -eq 0 ]; then
     set -- "$top_srcdir/tests/unit_tests"
 fi
 
-exec pytest -vv --log-level=NOTSET ${UNIT_TESTS_PATTERN:+-k $UNIT_TESTS_PATTERN} "$@"
+# Run the tests in parallel only if requested, it requires pytest-xdist
+exec pytest -vv --log-level=NOTSET ${UNIT_TESTS_PATTERN:+-k $UNIT_TESTS_PATTERN} \
+    ${UNIT_TESTS_JOBS:+-n $UNIT_TESTS_JOBS --dist=loadfile} "$@"